@@ -45,6 +45,8 @@ LICENCIA: CC BY-NC 4.0
 import time
 import sys
 import os
+import csv
+from collections import namedtuple
 from datetime import datetime
 import numpy as np
 
@@ -69,6 +71,13 @@ except ImportError:
     NETWORKX_OK = False
     print("WARNING: networkx not available. Graph visualization will be skipped.")
 
+try:
+    from numba import njit, prange
+    NUMBA_OK = True
+except ImportError:
+    NUMBA_OK = False
+    print("WARNING: numba not available. Tick scoring will run in Python/numpy.")
+
 
 # -------------------------
 # USER SETTINGS (EDIT HERE)
@@ -94,10 +103,15 @@ BATCH_BURN = 20
 # Problem instance (Max-Cut PoC)
 GRAPH_TYPE = "ring"      # "ring" or "custom"
 RING_WEIGHT = 1.0
+TARGET_SCORE = None      # custom graphs: stop once best score reaches this (None = full batch)
 
 # Runtime
 READ_TIMEOUT_S = 25      # stop if no data for N seconds
 PRINT_STATUS_LINES = True
+DEBUG_DATA = False       # echo every raw "O,..." line (very verbose, slows the loop)
+TICK_WINDOW = 64         # ticks kept in the reassembly ring (power of 2)
+USE_NUMBA = True         # JIT-compile the custom-graph scorer when numba is installed
+STRIDE_REPORT = 50       # completed ticks scored per vectorized pass ([BEST] updates)
 
 
 # -------------------------
@@ -109,26 +123,76 @@ def clamp_int(x, lo, hi):
 def clamp_float(x, lo, hi):
     return max(lo, min(hi, float(x)))
 
-def bits_from_bmask(bmask: int, width: int = 4):
-    return np.array([(bmask >> i) & 1 for i in range(width)], dtype=np.int8)
-
-def maxcut_score(bits: np.ndarray, edges):
-    score = 0.0
-    for (i, j, w) in edges:
-        if bits[i] != bits[j]:
-            score += w
-    return score
+def bits_from_state(state: int, n_bits: int):
+    # Packed state -> int8 bit vector (node 0 first) in one bytes/unpackbits pass
+    raw = np.frombuffer(int(state).to_bytes((n_bits + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:n_bits].view(np.int8)
+
+def bits_from_states(states: np.ndarray, n_bits: int):
+    # (k,) uint64 packed states -> (k, n_bits) int8 bit matrix, node 0 first
+    raw = states.astype('<u8').view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(raw, axis=1, bitorder='little')[:, :n_bits].view(np.int8)
+
+# Edge list stored as parallel arrays (SoA) so scoring is a vectorized gather
+Edges = namedtuple("Edges", ["i", "j", "w"])
+
+def maxcut_score(bits: np.ndarray, edges: Edges):
+    # bits: (n_bits,) for one sample or (k, n_bits) for a batch of samples
+    cut = bits[..., edges.i] ^ bits[..., edges.j]
+    return cut.astype(np.float64) @ edges.w
+
+def maxcut_score_ring_popcount(states: np.ndarray, adj_mask: int, n: int):
+    # Ring edge (k, k+1) is cut when bits k and k+1 differ: XOR against the
+    # 1-bit rotation marks every cut edge, so the cut size is one popcount.
+    adj = np.uint64(adj_mask)
+    rot = ((states << np.uint64(1)) | (states >> np.uint64(n - 1))) & adj
+    cut = (states ^ rot) & adj
+    if hasattr(np, "bitwise_count"):   # numpy >= 2.0
+        return np.bitwise_count(cut)
+    return np.unpackbits(cut.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+if NUMBA_OK:
+    # Custom (weighted) graphs can't use the popcount trick, so their scorer is a
+    # tight native loop over the edge arrays: bits are tested straight from the
+    # packed int and the XOR-sum is branchless so the inner loop can vectorize.
+    # States come in as int64 views; the arithmetic shift still yields bit 63.
+    # Samples are independent, so prange spreads them across cores.
+    # Explicit signature compiles at import time.
+    @njit("void(int64[:], int32[:], int32[:], float32[:], float64[:])", parallel=True, cache=True)
+    def score_states_nb(states, edges_i, edges_j, edges_w, out):
+        for t in prange(states.shape[0]):
+            state = states[t]
+            score = 0.0
+            for k in range(edges_i.shape[0]):
+                score += edges_w[k] * (((state >> edges_i[k]) ^ (state >> edges_j[k])) & 1)
+            out[t] = score
+
+def score_states(states: np.ndarray, n_bits: int, adj_mask: int, edges, use_jit: bool):
+    # Max-Cut score of every packed state in one vectorized pass
+    if edges is None:
+        return RING_WEIGHT * maxcut_score_ring_popcount(states, adj_mask, n_bits)
+    if use_jit:
+        out = np.empty(states.shape[0], dtype=np.float64)
+        score_states_nb(states.view(np.int64), edges.i, edges.j, edges.w, out)
+        return out
+    return maxcut_score(bits_from_states(states, n_bits), edges)
 
 def make_ring_edges(n, w=1.0):
     return [(i, (i + 1) % n, float(w)) for i in range(n)]
 
+def edges_to_arrays(edge_list):
+    i, j, w = zip(*edge_list)
+    return Edges(np.asarray(i, dtype=np.int32),
+                 np.asarray(j, dtype=np.int32),
+                 np.asarray(w, dtype=np.float32))
+
 def build_edges(n_bits):
     if GRAPH_TYPE == "ring":
-        return make_ring_edges(n_bits, RING_WEIGHT)
+        return edges_to_arrays(make_ring_edges(n_bits, RING_WEIGHT))
     # Add custom graph here if needed
     # Example:
-    # return [(0, 1, 1.0), (1, 2, 2.0), ...]
-    return make_ring_edges(n_bits, RING_WEIGHT)
+    # return edges_to_arrays([(0, 1, 1.0), (1, 2, 2.0), ...])
+    return edges_to_arrays(make_ring_edges(n_bits, RING_WEIGHT))
 
 def parse_kv_from_batch_header(line: str):
     # line format: "@BATCH RUN=.. TICK0=.. K=.. ..."
@@ -191,14 +255,28 @@ def main():
     BATCH_BURN = clamp_int(BATCH_BURN, 0, 5000)
 
     n_bits = NUM_SLAVES * BITS_PER_SLAVE
-    edges = build_edges(n_bits)
+    if n_bits > 64:
+        print("ERROR: NUM_SLAVES * BITS_PER_SLAVE must be <= 64 (samples are packed in uint64).")
+        return
+    adj_mask = (1 << n_bits) - 1
+    slave_mask = (1 << BITS_PER_SLAVE) - 1
+    # The ring is scored in closed form from adj_mask (popcount); only custom
+    # graphs need the edge arrays.
+    edges = None if GRAPH_TYPE == "ring" else build_edges(n_bits)
+    n_edges = n_bits if edges is None else len(edges.w)
+    bit_fmt = f"0{n_bits}b"
+    use_jit = USE_NUMBA and NUMBA_OK and edges is not None
+    # Known optimum of the ring: every edge cut (even n), one edge short for odd n
+    target_score = RING_WEIGHT * (n_bits - n_bits % 2) if edges is None else TARGET_SCORE
 
     print("\n--- CONFIG ---")
     print("PORT:", SERIAL_PORT)
     print("SLAVES:", NUM_SLAVES, "BITS/SLAVE:", BITS_PER_SLAVE, "TOTAL BITS:", n_bits)
     print("PARAMS: T=%.2f B=%d Kp=%d M=%d" % (PARAM_T, PARAM_B, PARAM_KP, PARAM_M))
     print("BATCH: K=%d STRIDE=%d BURN=%d" % (BATCH_K, BATCH_STRIDE, BATCH_BURN))
-    print("GRAPH:", GRAPH_TYPE, "EDGES:", len(edges))
+    print("GRAPH:", GRAPH_TYPE, "EDGES:", n_edges)
+    print("SCORER:", "popcount" if edges is None else ("numba" if use_jit else "numpy"))
+    print("TARGET:", target_score)
     print("--------------\n")
 
     # Open serial
@@ -224,115 +302,204 @@ def main():
     send(f"@GET K={BATCH_K} STRIDE={BATCH_STRIDE} BURN={BATCH_BURN}")
 
     best_score = -1e18
-    best_bits = None
+    best_state = None      # packed bits of the best sample (bit k = node k)
     best_tick = None
 
     last_rx_time = time.time()
     batch_meta = None
 
-    # Data collection for reports
-    all_scores = []        # All scores calculated
-    all_samples = []       # All samples: {'tick', 'score', 'bits'}
-    best_history = []      # (tick, best_score_so_far) for evolution plot
-
-    # We collect per-tick lines (one per slave) then score when a tick is complete
-    tick_buffer = {}  # tick -> dict(slaveIndex -> (bmask, loss, noise, seed))
+    # Data collection for reports. Completed ticks are queued as packed states
+    # and scored STRIDE_REPORT at a time in one vectorized pass.
+    state_buf = np.empty(BATCH_K, dtype=np.uint64)
+    tick_buf = np.empty(BATCH_K, dtype=np.int64)
+    score_buf = np.empty(BATCH_K, dtype=np.float64)          # All scores calculated
+    best_hist_score = np.empty(BATCH_K, dtype=np.float32)    # best-so-far per scored tick
+    n_done = 0             # completed ticks queued in state_buf
+    n_scored = 0           # of those, already scored/reported
+
+    # Samples are streamed to the CSV as they are scored; only the best row's
+    # is_best flag is patched in place once the batch is over.
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = os.path.join(script_dir, f"maxcut_results_{timestamp}.csv")
+    try:
+        csv_f = open(csv_path, 'w', newline='')
+        csv_w = csv.writer(csv_f, lineterminator="\n")
+        csv_w.writerow(("tick", "score", "bits", "is_best"))
+    except OSError as e:
+        csv_f = None
+        print(f"[CSV] Error abriendo CSV: {e}")
+    best_flag_pos = None          # file offset of the best row's is_best digit
+
+    # We collect per-tick lines (one per slave) then score when a tick is complete.
+    # Ring of TICK_WINDOW slots indexed by tick % TICK_WINDOW. Each slot packs its
+    # slave bmasks into one int as lines arrive (slave s owns bits s*BITS_PER_SLAVE..)
+    # and keeps one "received" bit per slave: plain ints, no per-tick arrays.
+    slot_tick = [-1] * TICK_WINDOW       # tick currently held by slot
+    slot_state = [0] * TICK_WINDOW       # packed bits received so far
+    slot_present = [0] * TICK_WINDOW     # bit s set once slave s has reported
+    all_present = (1 << NUM_SLAVES) - 1
+    highest_tick = -1      # ticks are monotonic within a batch: low-water mark for the ring
+
+    rx_buf = bytearray()   # bytes received but not yet split into lines
+    done = False
+
+    # Progress marks are buffered and written in one go every 50 ticks (or
+    # before any other console message) instead of one flushed print each.
+    status_buf = []
+
+    def flush_status():
+        if status_buf:
+            sys.stdout.write("".join(status_buf))
+            sys.stdout.flush()
+            status_buf.clear()
+
+    def score_pending():
+        # Scores the queued ticks, reports a new best and streams their CSV rows
+        nonlocal n_scored, best_score, best_state, best_tick, best_flag_pos
+        lo, hi = n_scored, n_done
+        if hi == lo:
+            return
+        scores = score_states(state_buf[lo:hi], n_bits, adj_mask, edges, use_jit)
+        score_buf[lo:hi] = scores
+        best_hist_score[lo:hi] = np.maximum(np.maximum.accumulate(scores), best_score)
+
+        rows = [(t, sc, format(st, bit_fmt)[::-1], 0)
+                for t, sc, st in zip(tick_buf[lo:hi].tolist(), scores.tolist(),
+                                     state_buf[lo:hi].tolist())]
+        k = int(scores.argmax())
+        if scores[k] > best_score:
+            best_score = float(scores[k])
+            best_state = int(state_buf[lo + k])
+            best_tick = int(tick_buf[lo + k])
+            flush_status()
+            print(f"\n[BEST] tick={best_tick} score={best_score:.2f} bits={rows[k][2]}")
+            if csv_f is not None:
+                csv_w.writerows(rows[:k + 1])
+                best_flag_pos = csv_f.tell() - 2   # rows are ASCII: tell() is a byte offset
+                rows = rows[k + 1:]
+        if csv_f is not None:
+            csv_w.writerows(rows)
+        n_scored = hi
 
     print("Listening... (Ctrl+C to stop)\n")
 
     try:
-        while True:
-            line = ser.readline().decode("utf-8", errors="ignore").strip()
-
-            if line:
+        while not done:
+            # Drain everything the OS has buffered in one read; the 1-byte read
+            # blocks (up to the port timeout) only when nothing is pending.
+            n_waiting = ser.in_waiting
+            chunk = ser.read(n_waiting) if n_waiting else ser.read(1)
+            if chunk:
                 last_rx_time = time.time()
+                rx_buf.extend(chunk)
+
+            # Process every complete line before going back to the OS
+            if b"\n" in rx_buf:
+                *raw_lines, rx_buf = rx_buf.split(b"\n")
+                for raw in raw_lines:
+                    line = raw.strip()
+                    if not line:
+                        continue
 
-                if line.startswith("@BATCH"):
-                    batch_meta = parse_kv_from_batch_header(line)
-                    print(f"[META] {batch_meta}")
-                    continue
-
-                if line.startswith("@DONE"):
-                    print(f"[DONE] {line}")
-                    break
+                    # Control/debug lines are rare: only these are decoded to str
+                    if not line.startswith(b"O,"):
+                        text = line.decode("utf-8", errors="ignore")
+
+                        if text.startswith("@BATCH"):
+                            batch_meta = parse_kv_from_batch_header(text)
+                            highest_tick = -1
+                            flush_status()
+                            print(f"[META] {batch_meta}")
+                            continue
+
+                        if text.startswith("@DONE"):
+                            flush_status()
+                            print(f"[DONE] {text}")
+                            done = True
+                            break
+
+                        # Print everything else to see what's happening
+                        if not text.startswith("@"):
+                            flush_status()
+                            print(f"[MSG] {text}")
+                        continue
 
-                # Print everything else to see what's happening
-                if not line.startswith("O,") and not line.startswith("@"):
-                    print(f"[MSG] {line}")
-                
-                if line.startswith("O,"):
                     # O,<tick>,<slaveIndex>,<bmask>,<loss>,<noise>,<seed>
-                    print(f"[DATA] {line}") # DEBUG: Verify data flow
-                    parts = line.split(",")
+                    if DEBUG_DATA:
+                        flush_status()
+                        print(f"[DATA] {line.decode('ascii', errors='ignore')}")
+                    parts = line.split(b",", 7)
                     if len(parts) < 7:
                         continue
 
+                    # loss/noise/seed are not needed for scoring
                     try:
                         tick = int(parts[1])
                         sidx = int(parts[2])
                         bmask = int(parts[3])
-                        loss = int(parts[4])
-                        noise = float(parts[5])
-                        seed = int(parts[6])
-                    except Exception:
+                    except ValueError:
                         continue
-
-                    if tick not in tick_buffer:
-                        tick_buffer[tick] = {}
-
-                    tick_buffer[tick][sidx] = (bmask, loss, noise, seed)
+                    if not 0 <= sidx < NUM_SLAVES:
+                        continue
+                    if tick > highest_tick:
+                        highest_tick = tick
+                    elif tick <= highest_tick - TICK_WINDOW:
+                        continue  # late line: its slot already belongs to a newer tick
+
+                    slot = tick & (TICK_WINDOW - 1)
+                    if slot_tick[slot] != tick:
+                        # Slot held an older tick: recycle it
+                        slot_tick[slot] = tick
+                        slot_state[slot] = 0
+                        slot_present[slot] = 0
+                    slave_bit = 1 << sidx
+                    if slot_present[slot] & slave_bit:
+                        continue  # duplicate line for this slave
+                    slot_present[slot] |= slave_bit
+                    slot_state[slot] |= (bmask & slave_mask) << (sidx * BITS_PER_SLAVE)
 
                     # UX: Progress indicator (dot every 10 lines received)
                     if tick % 10 == 0:
-                        print(".", end="", flush=True)
-
-                    if len(tick_buffer[tick]) >= NUM_SLAVES:
-                        # build full vector ordered by slave index
-                        vec = []
-                        for s in range(NUM_SLAVES):
-                            if s not in tick_buffer[tick]:
-                                break
-                            bm, *_rest = tick_buffer[tick][s]
-                            vec.append(bits_from_bmask(bm, width=BITS_PER_SLAVE))
-                        if len(vec) == NUM_SLAVES:
-                            bits = np.concatenate(vec)
-                            score = maxcut_score(bits, edges)
-                            bitstr = "".join(str(int(x)) for x in bits.tolist())
-                            
-                            # Store for later analysis
-                            all_scores.append(score)
-                            all_samples.append({'tick': tick, 'score': score, 'bits': bitstr})
-                            
-                            # Track best score evolution
-                            if score > best_score:
-                                best_score = score
-                                best_bits = bits.copy()
-                                best_tick = tick
-                                print(f"\n[BEST] tick={best_tick} score={best_score:.2f} bits={bitstr}")
-                            
-                            best_history.append((tick, best_score))
-                            
-                            # UX: Progress indicator
-                            if tick % 50 == 0:
-                                print(f" [{tick}/{BATCH_K}]", end="", flush=True)
-                                
-                        # cleanup old ticks to keep memory bounded
-                        if len(tick_buffer) > 50:
-                            for old in sorted(tick_buffer.keys())[:-20]:
-                                tick_buffer.pop(old, None)
+                        status_buf.append(".")
+
+                    if slot_present[slot] == all_present:
+                        if n_done < BATCH_K:
+                            state_buf[n_done] = slot_state[slot]
+                            tick_buf[n_done] = tick
+                            n_done += 1
+                            if n_done - n_scored >= STRIDE_REPORT:
+                                score_pending()
+                                if target_score is not None and best_score >= target_score:
+                                    flush_status()
+                                    print(f"\n[STOP] Score objetivo alcanzado ({best_score:.2f} >= {target_score}) en tick {best_tick}")
+                                    send("@STOP")  # MasterV3 aborts the rest of the batch (@ACK STOP)
+                                    done = True
+                                    break
+
+                        # UX: Progress indicator
+                        if tick % 50 == 0:
+                            status_buf.append(f" [{tick}/{BATCH_K}]")
+                            flush_status()
 
             # Timeout handling
             if (time.time() - last_rx_time) > READ_TIMEOUT_S:
+                flush_status()
                 print(f"TIMEOUT: No data received for {READ_TIMEOUT_S} seconds. Stopping.")
                 break
 
     except KeyboardInterrupt:
+        flush_status()
         print("\nStopped by user (KeyboardInterrupt).")
     finally:
         try:
             ser.close()
         except Exception:
             pass
+        score_pending()
+        flush_status()
+        if csv_f is not None:
+            csv_f.close()
 
     # =========================================================================
     # RESULTS AND REPORTS
@@ -340,11 +507,13 @@ def main():
     print("\n" + "="*60)
     print("                       RESULTADOS")
     print("="*60)
-    print(f"Muestras recolectadas: {len(all_scores)}")
+    print(f"Muestras recolectadas: {n_scored}")
     print(f"Mejor score: {best_score:.2f}")
-    if best_bits is not None:
+    best_bits = None
+    if best_state is not None:
+        best_bits = bits_from_state(best_state, n_bits)
         print(f"Mejor tick: {best_tick}")
-        print(f"Mejor config: {''.join(str(int(x)) for x in best_bits.tolist())}")
+        print(f"Mejor config: {format(best_state, bit_fmt)[::-1]}")
         print(f"Score máximo teórico (anillo): {n_bits}")
         print(f"Eficiencia: {100*best_score/n_bits:.1f}%")
     else:
@@ -354,33 +523,28 @@ def main():
     # -------------------------
     # CSV EXPORT
     # -------------------------
-    if len(all_samples) > 0:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_filename = f"maxcut_results_{timestamp}.csv"
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_path = os.path.join(script_dir, csv_filename)
-        
+    if csv_f is not None:
         try:
-            with open(csv_path, 'w') as f:
-                f.write("tick,score,bits,is_best\n")
-                for sample in all_samples:
-                    is_best = 1 if (best_bits is not None and sample['bits'] == ''.join(str(int(x)) for x in best_bits.tolist())) else 0
-                    f.write(f"{sample['tick']},{sample['score']},{sample['bits']},{is_best}\n")
-            print(f"\n[CSV] Datos guardados en: {csv_path}")
+            if n_scored > 0:
+                with open(csv_path, 'r+b') as f:
+                    f.seek(best_flag_pos)
+                    f.write(b"1")
+                print(f"\n[CSV] Datos guardados en: {csv_path}")
+            else:
+                os.remove(csv_path)
         except Exception as e:
             print(f"[CSV] Error guardando CSV: {e}")
 
     # -------------------------
     # GRAPHS
     # -------------------------
-    if MATPLOTLIB_OK and len(all_scores) > 0:
+    all_scores = score_buf[:n_scored]
+    if MATPLOTLIB_OK and n_scored > 0:
         fig, axes = plt.subplots(1, 2, figsize=(14, 5))
         
         # Graph 1: Score Evolution
         ax1 = axes[0]
-        ticks_list = [h[0] for h in best_history]
-        scores_list = [h[1] for h in best_history]
-        ax1.plot(ticks_list, scores_list, 'b-', linewidth=2, label='Mejor score')
+        ax1.plot(tick_buf[:n_scored], best_hist_score[:n_scored], 'b-', linewidth=2, label='Mejor score')
         ax1.axhline(y=n_bits, color='g', linestyle='--', label=f'Máximo teórico ({n_bits})')
         ax1.set_xlabel('Tick')
         ax1.set_ylabel('Score Max-Cut')
@@ -390,7 +554,12 @@ def main():
         
         # Graph 2: Score Histogram
         ax2 = axes[1]
-        ax2.hist(all_scores, bins=min(20, len(set(all_scores))), color='steelblue', edgecolor='white', alpha=0.8)
+        if edges is None:
+            # Ring scores are RING_WEIGHT * cut size, cut size in 0..n_bits: one bar per value
+            bins = RING_WEIGHT * (np.arange(n_bits + 2) - 0.5)
+        else:
+            bins = min(20, np.unique(all_scores).size)
+        ax2.hist(all_scores, bins=bins, color='steelblue', edgecolor='white', alpha=0.8)
         ax2.axvline(x=best_score, color='r', linestyle='--', linewidth=2, label=f'Mejor: {best_score:.1f}')
         ax2.set_xlabel('Score')
         ax2.set_ylabel('Frecuencia')
@@ -416,7 +585,11 @@ def main():
         try:
             G = nx.Graph()
             G.add_nodes_from(range(n_bits))
-            for (i, j, w) in edges:
+            if edges is None:
+                edge_list = make_ring_edges(n_bits, RING_WEIGHT)
+            else:
+                edge_list = zip(edges.i.tolist(), edges.j.tolist(), edges.w.tolist())
+            for i, j, w in edge_list:
                 G.add_edge(i, j, weight=w)
             
             colors = ['#ff6b6b' if b == 0 else '#4ecdc4' for b in best_bits]
@@ -71,8 +71,8 @@ def ejemplo_simple():
     print("\n✓ Ejemplo completado exitosamente!")
     print(f"\nLos datos están guardados en la carpeta: {processor.output_dir}/")
     print("\nPuedes cargar estos datos en tus simulaciones con:")
-    print("  import numpy as np")
-    print(f"  matriz = np.load('{archivos['tfidf_matrix']}')")
+    print("  import scipy.sparse as sp")
+    print(f"  matriz = sp.load_npz('{archivos['tfidf_matrix']}')")
 
 
 def ejemplo_analisis_similitud():
@@ -104,7 +104,7 @@ def ejemplo_analisis_similitud():
         print("\n⚠ No se pudieron obtener artículos")
         return
     
-    # Calcular matriz de similitud
+    # Calcular matriz de similitud (acepta la matriz CSR directamente)
     similitud = cosine_similarity(data['tfidf_matrix'])
     
     print("\n--- MATRIZ DE SIMILITUD (Coseno) ---")
@@ -165,7 +165,7 @@ def ejemplo_quantum_encoding():
     print("(Útil para mapear a qubits en simulaciones)\n")
     
     for i, titulo in enumerate(articulos):
-        vector = data['tfidf_matrix'][i]
+        vector = data['tfidf_matrix'][i].toarray().ravel()
         
         # Convertir a binario usando mediana como threshold
         # Manejar caso de vector vacío o todo ceros
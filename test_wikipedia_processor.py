@@ -8,6 +8,7 @@ Valida que todas las funciones principales funcionan correctamente.
 import os
 import sys
 import numpy as np
+import scipy.sparse as sp
 
 # Importar el módulo
 from wikipedia_processor import WikipediaProcessor
@@ -117,23 +118,23 @@ def test_basic_functionality():
     # Test 8: Validación de datos
     print("\n[TEST 8] Validación de datos exportados...")
     try:
-        # Cargar matriz numpy
-        npy_file = None
+        # Cargar matriz dispersa
+        npz_file = None
         for key, path in exported.items():
             if key == 'tfidf_matrix':
-                npy_file = path
+                npz_file = path
                 break
         
-        if npy_file:
-            loaded_matrix = np.load(npy_file)
-            if np.allclose(loaded_matrix, data['tfidf_matrix']):
+        if npz_file:
+            loaded_matrix = sp.load_npz(npz_file)
+            if np.allclose(loaded_matrix.toarray(), data['tfidf_matrix'].toarray()):
                 print("  ✓ Datos guardados y cargados correctamente")
                 print(f"    - Forma: {loaded_matrix.shape}")
             else:
                 print("  ✗ Datos no coinciden después de guardar/cargar")
                 return False
         else:
-            print("  ⚠ No se encontró archivo .npy para validar")
+            print("  ⚠ No se encontró archivo .npz para validar")
     except Exception as e:
         print(f"  ✗ Error validando datos: {e}")
         return False
@@ -29,7 +29,7 @@ DEPENDENCIAS:
 OUTPUTS:
     - CSV: Archivo con vectores TF-IDF de artículos procesados
     - JSON: Metadata de los artículos procesados
-    - NPY: Matrices numpy para fácil carga en simulaciones
+    - NPZ: Matriz TF-IDF dispersa (CSR de scipy) para fácil carga en simulaciones
 
 EJEMPLO DE USO:
     # Modo interactivo
@@ -50,6 +50,11 @@ import os
 import sys
 import json
 import re
+import time
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import islice
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 
@@ -78,14 +83,22 @@ except ImportError:
     print("Instalar con: pip install numpy")
 
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.preprocessing import normalize
+    from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+    import scipy.sparse as sp  # scipy y joblib se instalan con scikit-learn
+    import joblib
     SKLEARN_OK = True
 except ImportError:
     SKLEARN_OK = False
     print("ERROR: scikit-learn no está instalado.")
     print("Instalar con: pip install scikit-learn")
 
+# Opcional: orjson acelera la exportación JSON (pip install orjson)
+try:
+    import orjson
+    ORJSON_OK = True
+except ImportError:
+    ORJSON_OK = False
+
 
 # -------------------------
 # CONFIGURACIÓN POR DEFECTO
@@ -93,7 +106,32 @@ except ImportError:
 DEFAULT_LANGUAGE = 'es'
 DEFAULT_USER_AGENT = 'Quantum32WikiProcessor/1.0 (https://github.com/vlorcap1/Quantum32)'
 DEFAULT_MAX_FEATURES = 100  # Número de características TF-IDF a extraer
+DEFAULT_HASH_FEATURES = 2 ** 18  # Tamaño del espacio de features con use_hashing
+DEFAULT_CHUNK_SIZE = 10000  # Artículos por bloque al vectorizar con hashing
 DEFAULT_OUTPUT_DIR = 'wikipedia_data'
+DEFAULT_FETCH_WORKERS = 8  # Peticiones simultáneas a la API de Wikipedia
+CACHE_DIRNAME = '_cache'   # Subdirectorio de output_dir con artículos ya descargados
+CACHE_TTL_S = 86400        # Validez del caché de artículos (segundos)
+VECTORIZER_FILENAME = '_vectorizer.joblib'  # Vectorizador ajustado (en output_dir)
+
+# Patrones de limpieza compilados una sola vez
+# URLs y referencias [1], [2], [1-3], etc. (se eliminan). Se aplica sobre
+# texto ya en minúsculas: re.IGNORECASE haría esta pasada unas 3 veces más lenta
+_RE_URL_REF = re.compile(r'http\S+|www\.\S+|\[\d+(?:-\d+)?\]')
+
+# Caracteres especiales (se reemplazan por un espacio); mantiene letras,
+# dígitos, espacios y puntuación básica
+_RE_SPECIAL_CHARS = re.compile(r'[^\w\s\.\,\;\:\-]')
+# Lo mismo como tabla de str.translate, solo para texto ASCII: ahí translate
+# va en C (unas 20 veces más rápido que la regex); con caracteres no ASCII
+# consulta la tabla carácter a carácter y es más lento que la regex
+_ASCII_SPECIAL_CHARS_TABLE = str.maketrans({
+    c: ' ' for c in map(chr, range(128)) if _RE_SPECIAL_CHARS.match(c)
+})
+# Tokens para TF-IDF: palabras de 2+ caracteres alfanuméricos. La puntuación
+# y los caracteres especiales nunca forman parte de un token, así que el
+# vectorizador no necesita el texto pasado por clean_text.
+TOKEN_PATTERN = r'(?u)\b\w\w+\b'
 
 
 class WikipediaProcessor:
@@ -107,7 +145,12 @@ class WikipediaProcessor:
         language: str = DEFAULT_LANGUAGE,
         user_agent: str = DEFAULT_USER_AGENT,
         max_features: int = DEFAULT_MAX_FEATURES,
-        output_dir: str = DEFAULT_OUTPUT_DIR
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        use_cache: bool = True,
+        use_hashing: bool = False,
+        n_features: int = DEFAULT_HASH_FEATURES,
+        fetch_links: bool = False,
+        fetch_categories: bool = False
     ):
         """
         Inicializa el procesador de Wikipedia.
@@ -117,6 +160,17 @@ class WikipediaProcessor:
             user_agent: User agent para las peticiones a la API
             max_features: Número máximo de características TF-IDF
             output_dir: Directorio para guardar los datos procesados
+            use_cache: Reutilizar artículos descargados (en memoria y en
+                output_dir/_cache, válidos durante CACHE_TTL_S segundos)
+            use_hashing: Vectorizar con HashingVectorizer + TfidfTransformer
+                (sin vocabulario en memoria, una sola pasada; para corpus
+                grandes). Los features no tienen nombre: feature_names es None
+            n_features: Tamaño del espacio de features con use_hashing
+                (max_features no se aplica en ese modo)
+            fetch_links: Contar los enlaces de cada artículo (links_count).
+                Requiere peticiones extra a la API; si es False, links_count es None
+            fetch_categories: Obtener las categorías de cada artículo.
+                Requiere una petición extra a la API; si es False, categories es []
         """
         if not all([WIKIPEDIA_OK, PANDAS_OK, NUMPY_OK, SKLEARN_OK]):
             raise RuntimeError(
@@ -128,6 +182,15 @@ class WikipediaProcessor:
         self.user_agent = user_agent
         self.max_features = max_features
         self.output_dir = output_dir
+        self.use_cache = use_cache
+        self.use_hashing = use_hashing
+        self.n_features = n_features
+        self.fetch_links = fetch_links
+        self.fetch_categories = fetch_categories
+        self.cache_dir = os.path.join(output_dir, CACHE_DIRNAME)
+        self._article_cache = {}  # Caché en memoria: clave -> artículo
+        self._fitted_vectorizer = None  # Último TfidfVectorizer ajustado
+        self.vectorizer_path = os.path.join(output_dir, VECTORIZER_FILENAME)
 
         # Inicializar API de Wikipedia
         self.wiki = wikipediaapi.Wikipedia(
@@ -137,15 +200,128 @@ class WikipediaProcessor:
 
         # Crear directorio de salida si no existe
         os.makedirs(output_dir, exist_ok=True)
+        if use_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
 
         print(f"WikipediaProcessor inicializado:")
         print(f"  - Idioma: {language}")
-        print(f"  - Max features: {max_features}")
+        if use_hashing:
+            print(f"  - Hashing features: {n_features}")
+        else:
+            print(f"  - Max features: {max_features}")
         print(f"  - Output dir: {output_dir}")
+        print(f"  - Caché: {'activado' if use_cache else 'desactivado'}")
+
+    def _cache_key(self, title: str, *options: Any) -> str:
+        """
+        Clave de caché de un artículo: idioma, título y opciones de extracción.
+        """
+        raw = ":".join(str(x) for x in (self.language, title) + options)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
 
-    def clean_text(self, text: str) -> str:
+    def _load_cached_article(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca un artículo en el caché (memoria y luego disco).
+
+        Returns:
+            El artículo cacheado o None si no existe o está vencido
+        """
+        if key in self._article_cache:
+            return self._article_cache[key]
+
+        cache_file = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            if time.time() - os.path.getmtime(cache_file) >= CACHE_TTL_S:
+                return None
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                article = json.load(f)
+            # En disco el texto se guarda como str (JSON); en memoria, como UTF-8
+            article['text_utf8'] = article['text_utf8'].encode('utf-8')
+        except (OSError, ValueError, KeyError):
+            return None
+
+        self._article_cache[key] = article
+        return article
+
+    def _save_cached_article(self, key: str, article: Dict[str, Any]):
+        """
+        Guarda un artículo en el caché (memoria y disco).
+        """
+        self._article_cache[key] = article
+
+        cache_file = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            # Temporal único por escritura: los hilos del fetch paralelo comparten pid
+            fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    json.dump(dict(article, text_utf8=article['text_utf8'].decode('utf-8')), f, ensure_ascii=False)
+                os.replace(tmp_file, cache_file)  # Escritura atómica (fetch en paralelo)
+            except BaseException:
+                os.remove(tmp_file)
+                raise
+        except OSError as e:
+            print(f"  ⚠ No se pudo guardar en caché '{article['title']}': {e}")
+
+    def _vectorizer_config(self, stop_words: Optional[str]) -> Dict[str, Any]:
+        """
+        Configuración con la que se ajusta el TfidfVectorizer. Un vectorizador
+        guardado solo se reutiliza si se ajustó con esta misma configuración.
+        """
+        return {
+            'language': self.language,
+            'max_features': self.max_features,
+            'stop_words': stop_words,
+            'ngram_range': (1, 2),  # Unigramas y bigramas
+            'token_pattern': TOKEN_PATTERN
+        }
+
+    def _load_fitted_vectorizer(self, config: Dict[str, Any]) -> Optional["TfidfVectorizer"]:
+        """
+        Devuelve el último vectorizador ajustado (memoria o disco) con la
+        configuración dada, o None si no hay ninguno o no coincide.
+        """
+        if self._fitted_vectorizer is None and os.path.exists(self.vectorizer_path):
+            try:
+                saved = joblib.load(self.vectorizer_path)
+                self._fitted_vectorizer = (saved['config'], saved['vectorizer'])
+            except Exception as e:
+                print(f"  ⚠ No se pudo cargar el vectorizador: {e}")
+        if self._fitted_vectorizer is None:
+            return None
+
+        saved_config, vectorizer = self._fitted_vectorizer
+        if saved_config != config:
+            print(f"  ⚠ El vectorizador guardado se ajustó con otra configuración "
+                  f"({saved_config}); se ajusta uno nuevo")
+            return None
+        return vectorizer
+
+    def _save_fitted_vectorizer(
+        self,
+        vectorizer: "TfidfVectorizer",
+        config: Dict[str, Any],
+        persist: bool
+    ):
+        """
+        Guarda el vectorizador ajustado, junto con su configuración, en memoria
+        y, si persist es True, en output_dir.
+        """
+        self._fitted_vectorizer = (config, vectorizer)
+        if not persist:
+            return
+        try:
+            joblib.dump({'config': config, 'vectorizer': vectorizer}, self.vectorizer_path, compress=3)
+        except OSError as e:
+            print(f"  ⚠ No se pudo guardar el vectorizador: {e}")
+
+    @staticmethod
+    def clean_text(text: str) -> str:
         """
         Limpia el texto eliminando caracteres especiales y normalizando.
+        (El pipeline TF-IDF no la usa: el vectorizador tokeniza y pasa a
+        minúsculas por sí mismo.) No depende de la instancia: usa solo los
+        patrones compilados del módulo.
 
         Args:
             text: Texto a limpiar
@@ -156,19 +332,17 @@ class WikipediaProcessor:
         # Convertir a minúsculas
         text = text.lower()
 
-        # Eliminar URLs
-        text = re.sub(r'http\S+|www\.\S+', '', text)
-
-        # Eliminar referencias [1], [2], [1-3], etc.
-        text = re.sub(r'\[\d+(?:-\d+)?\]', '', text)
+        # Eliminar URLs y referencias en una sola pasada
+        text = _RE_URL_REF.sub('', text)
 
-        # Eliminar caracteres especiales pero mantener espacios y puntuación básica
-        text = re.sub(r'[^\w\s\.\,\;\:\-]', ' ', text)
+        # Caracteres especiales -> espacio
+        if text.isascii():
+            text = text.translate(_ASCII_SPECIAL_CHARS_TABLE)
+        else:
+            text = _RE_SPECIAL_CHARS.sub(' ', text)
 
-        # Normalizar espacios múltiples
-        text = re.sub(r'\s+', ' ', text)
-
-        return text.strip()
+        # Normalizar espacios múltiples (split también recorta los extremos)
+        return ' '.join(text.split())
 
     def fetch_article(self, title: str, summary_length: int = 500) -> Optional[Dict[str, Any]]:
         """
@@ -182,122 +356,221 @@ class WikipediaProcessor:
         """
         print(f"Obteniendo artículo: '{title}'...")
 
+        if self.use_cache:
+            cache_key = self._cache_key(title, summary_length, self.fetch_links, self.fetch_categories)
+            article = self._load_cached_article(cache_key)
+            if article is not None:
+                print(f"  ✓ Artículo en caché: {article['length']} caracteres")
+                return article
+
         page = self.wiki.page(title)
 
         if not page.exists():
             print(f"  ⚠ Artículo '{title}' no encontrado")
             return None
 
-        # Extraer información
+        # Extraer información (links y categorías son peticiones aparte: opcionales).
+        # El texto se guarda en UTF-8: un str con cualquier carácter fuera de
+        # Latin-1 (—, ψ, ℏ...) ocupa 2-4 bytes por carácter en memoria.
+        # El resumen sale de la misma respuesta 'extracts' que el texto (sin
+        # petición extra); se lee una sola vez y solo se guarda el recorte.
+        text = page.text
+        summary = page.summary or ''
         article = {
             'title': page.title,
             'url': page.fullurl,
-            'summary': page.summary[:summary_length] if page.summary else '',  # Configurable length
-            'text': page.text,
-            'categories': list(page.categories.keys())[:10],  # Primeras 10 categorías
-            'links_count': len(page.links),
-            'length': len(page.text),
+            'summary': summary[:summary_length],  # Configurable length
+            'text_utf8': text.encode('utf-8'),
+            'categories': list(islice(page.categories, 10)) if self.fetch_categories else [],  # Primeras 10 categorías
+            'links_count': len(page.links) if self.fetch_links else None,
+            'length': len(text),
             'fetched_at': datetime.now().isoformat()
         }
 
-        print(f"  ✓ Artículo obtenido: {len(article['text'])} caracteres")
+        print(f"  ✓ Artículo obtenido: {article['length']} caracteres")
+
+        if self.use_cache:
+            self._save_cached_article(cache_key, article)
         return article
 
-    def fetch_articles(self, titles: List[str]) -> List[Dict[str, Any]]:
+    def fetch_articles(
+        self,
+        titles: List[str],
+        max_workers: int = DEFAULT_FETCH_WORKERS
+    ) -> List[Dict[str, Any]]:
         """
-        Obtiene múltiples artículos de Wikipedia.
+        Obtiene múltiples artículos de Wikipedia en paralelo.
+
+        Las peticiones se reparten en un pool de hilos; el cliente HTTP de
+        wikipedia-api es compartido y reutiliza las conexiones abiertas.
 
         Args:
             titles: Lista de títulos de artículos
+            max_workers: Número máximo de peticiones simultáneas
 
         Returns:
             Lista de diccionarios con información de los artículos
+            (en el mismo orden que los títulos)
         """
-        articles = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = list(executor.map(self.fetch_article, titles))
 
-        for title in titles:
-            article = self.fetch_article(title)
-            if article:
-                articles.append(article)
+        articles = [article for article in results if article]
 
         print(f"\n{len(articles)}/{len(titles)} artículos obtenidos exitosamente")
         return articles
 
     def tokenize_and_vectorize(
         self,
-        articles: List[Dict[str, Any]]
-    ) -> Tuple[np.ndarray, List[str], Dict[str, Any]]:
+        articles: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        clean_workers: int = 1,
+        refit: bool = True
+    ) -> Tuple["sp.csr_matrix", List[str], Dict[str, Any]]:
         """
         Tokeniza y vectoriza los artículos usando TF-IDF.
 
         Args:
             articles: Lista de artículos obtenidos
+            chunk_size: Con use_hashing, número de artículos vectorizados por
+                bloque (acota la memoria intermedia; el resultado es idéntico)
+            clean_workers: Procesos para preparar los textos en paralelo
+                (1 = en este proceso). Útil con muchos artículos grandes
+            refit: Ajustar vocabulario e IDF con estos artículos. Si es False,
+                se reutiliza el último vectorizador ajustado (en memoria o en
+                output_dir/_vectorizer.joblib) y solo se transforma; si no
+                hay ninguno o se ajustó con otra configuración (idioma,
+                max_features, stop words...), se ajusta igualmente y se
+                guarda en output_dir para las siguientes ejecuciones. Con
+                True no se escribe nada a disco. No aplica con use_hashing
 
         Returns:
-            Tupla con (matriz TF-IDF, lista de features, metadata)
+            Tupla con (matriz TF-IDF dispersa CSR, lista de features, metadata).
+            Con use_hashing la lista de features es None (el hashing no es invertible)
         """
         if not articles:
             raise ValueError("No hay artículos para procesar")
 
         print("\nProcesando texto...")
 
-        # Limpiar textos
-        texts = [self.clean_text(article['text']) for article in articles]
+        # Quitar URLs y referencias; minúsculas y tokenización las hace el vectorizador.
+        # Iterador perezoso: fit_transform recorre los textos una sola vez, así no
+        # se guarda una segunda copia de todo el corpus en memoria. Con
+        # clean_workers > 1 la preparación se reparte en un pool de procesos.
         titles = [article['title'] for article in articles]
+        raw_texts = (article['text_utf8'] for article in articles)
+        executor = ProcessPoolExecutor(max_workers=clean_workers) if clean_workers > 1 else None
+        if executor is not None:
+            texts = executor.map(prepare_text, raw_texts, chunksize=4)
+        else:
+            texts = map(prepare_text, raw_texts)
 
-        print(f"  - {len(texts)} textos limpiados")
-
-        # Vectorización TF-IDF
-        print(f"  - Vectorizando con TF-IDF (max_features={self.max_features})...")
-
-        # Configure stop words based on language
-        stop_words_config = None
-        if self.language in ['en', 'english']:
-            stop_words_config = 'english'
-        # Note: scikit-learn has limited language support for stop words
-        # For Spanish and other languages, consider using external libraries
-
-        vectorizer = TfidfVectorizer(
-            max_features=self.max_features,
-            stop_words=stop_words_config,
-            ngram_range=(1, 2),  # Unigramas y bigramas
-            min_df=1,
-            max_df=0.95
-        )
+        print(f"  - {len(titles)} textos a vectorizar")
 
-        tfidf_matrix = vectorizer.fit_transform(texts)
-        feature_names = vectorizer.get_feature_names_out()
+        try:
+            # Configure stop words based on language
+            stop_words_config = None
+            if self.language in ['en', 'english']:
+                stop_words_config = 'english'
+            # Note: scikit-learn has limited language support for stop words
+            # For Spanish and other languages, consider using external libraries
+
+            if self.use_hashing:
+                # Vectorización por hashing: sin vocabulario, una sola pasada
+                print(f"  - Vectorizando con Hashing + TF-IDF (n_features={self.n_features})...")
+
+                hasher = HashingVectorizer(
+                    n_features=self.n_features,
+                    stop_words=stop_words_config,
+                    lowercase=True,
+                    token_pattern=TOKEN_PATTERN,
+                    ngram_range=(1, 2),  # Unigramas y bigramas
+                    alternate_sign=False,
+                    norm=None,
+                    dtype=np.float32  # TfidfTransformer conserva float32
+                )
+                # El hashing no tiene estado: cada bloque se vectoriza por separado
+                # y solo se apilan las matrices dispersas resultantes
+                counts = sp.vstack(
+                    [hasher.transform(chunk) for chunk in iter_chunks(texts, chunk_size)],
+                    format='csr'
+                )
+                tfidf_matrix = TfidfTransformer(norm='l2').fit_transform(counts)
+                feature_names = None
+                n_features = self.n_features
+                vectorizer_params = {
+                    'hashing': True,
+                    'n_features': self.n_features,
+                    'ngram_range': (1, 2)
+                }
+            else:
+                config = self._vectorizer_config(stop_words_config)
+                vectorizer = None if refit else self._load_fitted_vectorizer(config)
+                fitted_now = vectorizer is None
+
+                if not fitted_now:
+                    # Vocabulario e IDF ya ajustados: solo transformar
+                    print(f"  - Vectorizando con TF-IDF ajustado previamente "
+                          f"(max_features={vectorizer.max_features})...")
+                    tfidf_matrix = vectorizer.transform(texts)
+                else:
+                    # Vectorización TF-IDF
+                    print(f"  - Vectorizando con TF-IDF (max_features={self.max_features})...")
+
+                    vectorizer = TfidfVectorizer(
+                        max_features=config['max_features'],
+                        stop_words=config['stop_words'],
+                        lowercase=True,
+                        token_pattern=config['token_pattern'],
+                        ngram_range=config['ngram_range'],
+                        min_df=1,
+                        max_df=0.95,
+                        norm='l2',  # Vectores normalizados (útil para simulaciones cuánticas)
+                        dtype=np.float32  # Precisión suficiente; mitad de memoria que float64
+                    )
+
+                    tfidf_matrix = vectorizer.fit_transform(texts)
+                    # Solo se escribe a disco si se pidió reutilizarlo (refit=False)
+                    self._save_fitted_vectorizer(vectorizer, config, persist=not refit)
+
+                feature_names = vectorizer.get_feature_names_out().tolist()
+                n_features = len(feature_names)
+                vectorizer_params = {
+                    'max_features': vectorizer.max_features,
+                    'ngram_range': vectorizer.ngram_range,
+                    'refit': fitted_now
+                }
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         print(f"  ✓ Matriz TF-IDF creada: {tfidf_matrix.shape}")
-        print(f"  ✓ Features extraídos: {len(feature_names)}")
-
-        # Normalizar vectores (útil para simulaciones cuánticas)
-        tfidf_normalized = normalize(tfidf_matrix, norm='l2')
+        print(f"  ✓ Features extraídos: {n_features}")
 
         # Metadata
         metadata = {
             'n_articles': len(articles),
-            'n_features': len(feature_names),
-            'feature_names': feature_names.tolist(),
+            'n_features': n_features,
+            'feature_names': feature_names,
             'article_titles': titles,
-            'vectorizer_params': {
-                'max_features': self.max_features,
-                'ngram_range': (1, 2)
-            },
+            'vectorizer_params': vectorizer_params,
             'processed_at': datetime.now().isoformat()
         }
 
-        return tfidf_normalized.toarray(), feature_names.tolist(), metadata
+        # Se mantiene en formato CSR: la matriz TF-IDF es casi toda ceros
+        return tfidf_matrix, feature_names, metadata
 
     def process_articles(
         self,
-        titles: List[str]
+        titles: List[str],
+        refit: bool = True
     ) -> Dict[str, Any]:
         """
         Pipeline completo: obtiene, limpia, tokeniza y vectoriza artículos.
 
         Args:
             titles: Lista de títulos de artículos de Wikipedia
+            refit: Ajustar un vectorizador nuevo (ver tokenize_and_vectorize)
 
         Returns:
             Diccionario con todos los datos procesados
@@ -319,7 +592,7 @@ class WikipediaProcessor:
             }
 
         # Vectorizar
-        tfidf_matrix, feature_names, metadata = self.tokenize_and_vectorize(articles)
+        tfidf_matrix, feature_names, metadata = self.tokenize_and_vectorize(articles, refit=refit)
 
         # Preparar resultado
         result = {
@@ -338,7 +611,9 @@ class WikipediaProcessor:
     def export_data(
         self,
         data: Dict[str, Any],
-        base_filename: str = 'wikipedia_processed'
+        base_filename: str = 'wikipedia_processed',
+        dense_csv: bool = False,
+        export_feature_names_txt: bool = False
     ) -> Dict[str, str]:
         """
         Exporta los datos procesados en múltiples formatos.
@@ -346,6 +621,12 @@ class WikipediaProcessor:
         Args:
             data: Datos procesados del método process_articles
             base_filename: Nombre base para los archivos de salida
+            dense_csv: Si es True, el CSV de features es la matriz completa
+                (artículos x features, incluyendo ceros). Por defecto solo se
+                escriben los valores no-cero como filas
+                (doc_idx, doc_title, feature_idx, feature, score)
+            export_feature_names_txt: Escribir también la lista numerada de
+                features en un .txt (ya está en el CSV; no existe con hashing)
 
         Returns:
             Diccionario con rutas de archivos generados
@@ -361,33 +642,49 @@ class WikipediaProcessor:
 
         print("\nExportando datos...")
 
-        # 1. Matriz TF-IDF como numpy array (formato binario eficiente)
-        npy_path = f"{base_path}_tfidf.npy"
-        np.save(npy_path, data['tfidf_matrix'])
-        exported_files['tfidf_matrix'] = npy_path
-        print(f"  ✓ Matriz TF-IDF: {npy_path}")
+        # 1. Matriz TF-IDF dispersa (formato binario eficiente, solo valores no-cero)
+        npz_path = f"{base_path}_tfidf.npz"
+        sp.save_npz(npz_path, data['tfidf_matrix'])
+        exported_files['tfidf_matrix'] = npz_path
+        print(f"  ✓ Matriz TF-IDF: {npz_path}")
 
         # 2. CSV con features (para análisis en Excel/Python)
         csv_path = f"{base_path}_features.csv"
-        df = pd.DataFrame(
-            data['tfidf_matrix'],
-            columns=data['feature_names'],
-            index=data['metadata']['article_titles']
-        )
-        df.to_csv(csv_path, encoding='utf-8')
+        if dense_csv:
+            df = pd.DataFrame(
+                data['tfidf_matrix'].toarray(),
+                columns=data['feature_names'],
+                index=data['metadata']['article_titles']
+            )
+            df.to_csv(csv_path, encoding='utf-8')
+        else:
+            # Formato disperso: una fila por valor no-cero
+            coo = data['tfidf_matrix'].tocoo()
+            titles = np.asarray(data['metadata']['article_titles'], dtype=object)
+            if data['feature_names'] is not None:
+                features = np.asarray(data['feature_names'], dtype=object)[coo.col]
+            else:
+                features = "#" + pd.Series(coo.col).astype(str)  # Hashing: sin nombres
+            df = pd.DataFrame({
+                'doc_idx': coo.row,
+                'doc_title': titles[coo.row],
+                'feature_idx': coo.col,
+                'feature': features,
+                'score': coo.data
+            })
+            df.to_csv(csv_path, index=False, encoding='utf-8')
         exported_files['features_csv'] = csv_path
         print(f"  ✓ Features CSV: {csv_path}")
 
         # 3. Metadata JSON
         json_path = f"{base_path}_metadata.json"
-        metadata_export = data['metadata'].copy()
-        # Remover feature_names del JSON (ya están en CSV) para reducir tamaño
-        if 'feature_names' in metadata_export:
-            metadata_export['feature_names_count'] = len(metadata_export['feature_names'])
-            metadata_export.pop('feature_names')
-
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata_export, f, indent=2, ensure_ascii=False)
+        # Sin feature_names en el JSON (ya están en el CSV) para reducir tamaño
+        metadata = data['metadata']
+        metadata_export = {k: v for k, v in metadata.items() if k != 'feature_names'}
+        if 'feature_names' in metadata:
+            metadata_export['feature_names_count'] = len(metadata['feature_names'] or [])
+
+        write_json(json_path, metadata_export)
         exported_files['metadata'] = json_path
         print(f"  ✓ Metadata JSON: {json_path}")
 
@@ -406,18 +703,17 @@ class WikipediaProcessor:
             for a in data['articles']
         ]
 
-        with open(articles_json_path, 'w', encoding='utf-8') as f:
-            json.dump(articles_export, f, indent=2, ensure_ascii=False)
+        write_json(articles_json_path, articles_export)
         exported_files['articles'] = articles_json_path
         print(f"  ✓ Artículos JSON: {articles_json_path}")
 
-        # 5. Feature names (lista de términos importantes)
-        features_txt_path = f"{base_path}_feature_names.txt"
-        with open(features_txt_path, 'w', encoding='utf-8') as f:
-            for i, feature in enumerate(data['feature_names'], 1):
-                f.write(f"{i}. {feature}\n")
-        exported_files['feature_names'] = features_txt_path
-        print(f"  ✓ Feature names: {features_txt_path}")
+        # 5. Feature names (lista de términos importantes; no existe con hashing)
+        if export_feature_names_txt and data['feature_names'] is not None:
+            features_txt_path = f"{base_path}_feature_names.txt"
+            with open(features_txt_path, 'w', encoding='utf-8') as f:
+                f.write("".join(f"{i}. {feature}\n" for i, feature in enumerate(data['feature_names'], 1)))
+            exported_files['feature_names'] = features_txt_path
+            print(f"  ✓ Feature names: {features_txt_path}")
 
         print(f"\n✓ Datos exportados exitosamente en: {self.output_dir}/")
 
@@ -439,19 +735,22 @@ class WikipediaProcessor:
             Diccionario con título del artículo y sus top términos
         """
         result = {}
+        matrix = data['tfidf_matrix']
 
         for i, title in enumerate(data['metadata']['article_titles']):
-            # Obtener scores TF-IDF para este artículo
-            scores = data['tfidf_matrix'][i]
+            # Scores no-cero de este artículo (fila CSR: índices + valores)
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            indices = matrix.indices[start:end]
+            scores = matrix.data[start:end]
 
-            # Obtener índices de los top N scores
-            top_indices = np.argsort(scores)[-top_n:][::-1]
+            # Obtener posiciones de los top N scores
+            top_pos = top_k_indices(scores, top_n)
 
             # Obtener términos y scores
             top_terms = [
-                (data['feature_names'][idx], scores[idx])
-                for idx in top_indices
-                if scores[idx] > 0
+                (feature_label(data['feature_names'], indices[k]), scores[k])
+                for k in top_pos
+                if scores[k] > 0
             ]
 
             result[title] = top_terms
@@ -462,6 +761,59 @@ class WikipediaProcessor:
 # -------------------------
 # FUNCIONES AUXILIARES
 # -------------------------
+def feature_label(feature_names: Optional[List[str]], idx: int) -> str:
+    """
+    Nombre de un feature; con hashing (sin nombres) se usa su índice.
+    """
+    return feature_names[idx] if feature_names is not None else f"#{idx}"
+
+
+def prepare_text(text_utf8: bytes) -> str:
+    """
+    Prepara un texto para el vectorizador: lo decodifica (UTF-8), lo pasa a
+    minúsculas y elimina URLs y referencias.
+    (Función de módulo para poder usarla desde un ProcessPoolExecutor.)
+    """
+    return _RE_URL_REF.sub('', text_utf8.decode('utf-8').lower())
+
+
+def write_json(path: str, obj: Any):
+    """
+    Escribe un objeto como JSON UTF-8: con orjson si está disponible
+    (indentado, mucho más rápido); si no, json estándar sin indentar.
+    """
+    if ORJSON_OK:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False)
+
+
+def iter_chunks(iterable, size: int):
+    """
+    Recorre un iterable en listas de hasta `size` elementos.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, max(1, size)))
+        if not chunk:
+            return
+        yield chunk
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Índices de los k mayores valores, ordenados de mayor a menor.
+    Usa argpartition (O(n)) y solo ordena los k seleccionados.
+    """
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    part = np.argpartition(scores, -k)[-k:]
+    return part[np.argsort(scores[part])[::-1]]
+
+
 def print_analysis(data: Dict[str, Any]):
     """
     Imprime un análisis resumido de los datos procesados.
@@ -471,28 +823,39 @@ def print_analysis(data: Dict[str, Any]):
     print("="*70)
 
     metadata = data['metadata']
+    matrix = data['tfidf_matrix']
     print(f"\nArtículos procesados: {metadata['n_articles']}")
     print(f"Features extraídos: {metadata['n_features']}")
-    print(f"Dimensión de matriz: {data['tfidf_matrix'].shape}")
+    print(f"Dimensión de matriz: {matrix.shape}")
 
     print("\nArtículos:")
     for i, title in enumerate(metadata['article_titles'], 1):
         print(f"  {i}. {title}")
 
-    # Estadísticas de la matriz
+    # Estadísticas de la matriz (en CSR basta con los valores no-cero: O(nnz))
+    size = matrix.shape[0] * matrix.shape[1]
+    if sp.issparse(matrix):
+        nnz = matrix.nnz
+        values = matrix.data
+    else:
+        nnz = np.count_nonzero(matrix)
+        values = matrix.ravel()
+    mean = float(values.sum()) / size if size else 0.0
+    # Los ceros solo aportan al denominador: Var = E[x²] - media²
+    var = float(np.dot(values, values)) / size - mean ** 2 if size else 0.0
     print("\nEstadísticas de vectorización:")
-    print(f"  - Valores no-cero: {np.count_nonzero(data['tfidf_matrix'])}")
-    print(f"  - Sparsity: {100 * (1 - np.count_nonzero(data['tfidf_matrix']) / data['tfidf_matrix'].size):.2f}%")
-    print(f"  - Media de scores: {np.mean(data['tfidf_matrix']):.4f}")
-    print(f"  - Std de scores: {np.std(data['tfidf_matrix']):.4f}")
+    print(f"  - Valores no-cero: {nnz}")
+    print(f"  - Sparsity: {100 * (1 - nnz / size):.2f}%")
+    print(f"  - Media de scores: {mean:.4f}")
+    print(f"  - Std de scores: {np.sqrt(max(var, 0.0)):.4f}")
 
     # Top features globales
     print("\nTop 10 features globales (por suma de TF-IDF):")
-    global_scores = np.sum(data['tfidf_matrix'], axis=0)
-    top_global_indices = np.argsort(global_scores)[-10:][::-1]
+    global_scores = np.asarray(matrix.sum(axis=0)).ravel()
+    top_global_indices = top_k_indices(global_scores, 10)
 
     for i, idx in enumerate(top_global_indices, 1):
-        feature = data['feature_names'][idx]
+        feature = feature_label(data['feature_names'], idx)
         score = global_scores[idx]
         print(f"  {i}. {feature}: {score:.4f}")
 
@@ -595,8 +958,8 @@ def main():
     print("="*70)
     print("\nLos datos están listos para ser utilizados en simulaciones Quantum32.")
     print("Para cargar los datos en otro script Python:")
-    print("  import numpy as np")
-    print("  tfidf_matrix = np.load('wikipedia_data/<archivo>_tfidf.npy')")
+    print("  import scipy.sparse as sp")
+    print("  tfidf_matrix = sp.load_npz('wikipedia_data/<archivo>_tfidf.npz')")
 
 
 if __name__ == "__main__":